@@ -12,10 +12,12 @@ from src.georef.polar import polar_dataset_to_lonlat
 from src.georef.gridding import polar_to_grid_2d
 
 
-def save_netcdf(ds: xr.Dataset, out_nc: Path, nodata: float | None = None) -> None:
+def save_netcdf(ds: xr.Dataset, out_nc: Path, nodata: float | None = None,
+                complevel: int = 4, chunk: int = 512,
+                engine: str = "h5netcdf", parallel: bool = False) -> None:
     out_nc.parent.mkdir(parents=True, exist_ok=True)
 
-    # Preparar encoding (dtype/FillValue) para variables de datos
+    # Preparar encoding (dtype/FillValue/chunks/compresión) para variables de datos
     encoding = {}
     for v in ds.data_vars:
         enc = {}
@@ -23,6 +25,11 @@ def save_netcdf(ds: xr.Dataset, out_nc: Path, nodata: float | None = None) -> No
         enc["dtype"] = "float32"
         if nodata is not None:
             enc["_FillValue"] = np.float32(nodata)
+        # Chunks de cortes 2-D completos, acotados a chunk x chunk (~1 MB en float32)
+        if ds[v].ndim > 0:
+            enc["chunksizes"] = tuple(min(chunk, n) for n in ds[v].shape)
+        if complevel > 0:
+            enc.update({"zlib": True, "complevel": int(complevel), "shuffle": True})
         encoding[v] = enc
 
     # Asegurar codificación simple en coords (evitar FillValue en coords)
@@ -38,18 +45,62 @@ def save_netcdf(ds: xr.Dataset, out_nc: Path, nodata: float | None = None) -> No
     gattrs.setdefault("history", "Created by caxx-radar/scripts/parse_azi.py")
     ds = ds.assign_attrs(gattrs)
 
-    ds.to_netcdf(out_nc, encoding=encoding)
+    # Atributos ya asignados: la cabecera se escribe de una vez al crear el archivo
+    kwargs = {"invalid_netcdf": False} if engine == "h5netcdf" else {}
+    if parallel:
+        # Escritura diferida por chunks (dask opcional, chunks = chunks del archivo).
+        # Los backends HDF5 escriben bajo un lock global: la compresión NO se paraleliza;
+        # sólo sirve para solapar el cómputo de datos perezosos con la escritura.
+        try:
+            import dask  # noqa: F401
+        except ImportError as e:
+            raise ImportError("--nc-parallel requiere 'dask' instalado.") from e
+        ds = ds.chunk({d: min(chunk, n) for d, n in ds.sizes.items()})
+        delayed = ds.to_netcdf(out_nc, format="NETCDF4", engine=engine, encoding=encoding,
+                               compute=False, **kwargs)
+        delayed.compute(scheduler="threads")
+    else:
+        ds.to_netcdf(out_nc, format="NETCDF4", engine=engine, encoding=encoding, **kwargs)
     print(f"[OK] NetCDF guardado: {out_nc}")
 
 
-def main():
+def _positive_int(text: str) -> int:
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"debe ser un entero >= 1: {text}")
+    return value
+
+
+def _complevel(text: str) -> int:
+    value = int(text)
+    if not 0 <= value <= 9:
+        raise argparse.ArgumentTypeError(f"debe estar entre 0 y 9: {text}")
+    return value
+
+
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="Parsea .azi (Rainbow) del radar CAXX y exporta NetCDF.")
     ap.add_argument("--file", required=True, help="Ruta al archivo .azi")
     ap.add_argument("--config", default="config/params.yaml", help="YAML de parámetros")
     ap.add_argument("--out-prefix", default="caxx", help="Prefijo para archivos de salida")
     ap.add_argument("--nc-polar", action="store_true", help="Guardar NetCDF en coordenadas polares")
     ap.add_argument("--nc-grid", action="store_true", help="Guardar NetCDF en grilla cartesiana (EPSG del YAML)")
-    args = ap.parse_args()
+    ap.add_argument("--grid-cache", default=None,
+                    help="Directorio para reutilizar el mapeo polar->grilla entre ejecuciones")
+    ap.add_argument("--nc-complevel", type=_complevel, default=4,
+                    help="Nivel de compresión zlib del NetCDF (0 = sin compresión)")
+    ap.add_argument("--nc-chunk", type=_positive_int, default=512,
+                    help="Tamaño máximo de chunk por dimensión en el NetCDF")
+    ap.add_argument("--nc-engine", default="h5netcdf", choices=("h5netcdf", "netcdf4"),
+                    help="Backend de escritura NetCDF")
+    ap.add_argument("--nc-parallel", action="store_true",
+                    help="Escritura diferida por chunks con dask (requiere dask; las escrituras "
+                         "HDF5 se serializan, no acelera la compresión)")
+    return ap
+
+
+def main():
+    args = build_parser().parse_args()
 
     azi_path = Path(args.file)
     cfg_path = Path(args.config)
@@ -65,7 +116,9 @@ def main():
     # Guardar polar si se solicita
     if args.nc_polar:
         out_nc_polar = Path("data/processed") / f"{args.out_prefix}_polar.nc"
-        save_netcdf(ds_polar, out_nc_polar)
+        save_netcdf(ds_polar, out_nc_polar,
+                    complevel=args.nc_complevel, chunk=args.nc_chunk,
+                    engine=args.nc_engine, parallel=args.nc_parallel)
 
     # 2) Georreferenciar a lon/lat y rasterizar a grilla UTM, luego guardar NetCDF
     if args.nc_grid:
@@ -80,9 +133,11 @@ def main():
         dy = float(cfg["grid"]["dy"])
         buffer_m = float(cfg["grid"]["buffer_m"])
         nodata = float(cfg["io"]["nodata"])
+        extent = cfg["grid"].get("extent")  # opcional: [x0, x1, y0, y1]
 
         ds_grid = polar_to_grid_2d(
-            ds_ll, epsg=epsg, dx=dx, dy=dy, buffer_m=buffer_m, nodata=nodata
+            ds_ll, epsg=epsg, dx=dx, dy=dy, buffer_m=buffer_m, nodata=nodata,
+            cache_dir=args.grid_cache, extent=extent
         )
 
         # Añadir metadatos útiles
@@ -93,7 +148,9 @@ def main():
         })
 
         out_nc_grid = Path("data/processed") / f"{args.out_prefix}_grid.nc"
-        save_netcdf(ds_grid, out_nc_grid, nodata=nodata)
+        save_netcdf(ds_grid, out_nc_grid, nodata=nodata,
+                    complevel=args.nc_complevel, chunk=args.nc_chunk,
+                    engine=args.nc_engine, parallel=args.nc_parallel)
 
 
 if __name__ == "__main__":
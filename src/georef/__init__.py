@@ -1,3 +1,3 @@
 # src/georef/__init__.py
-from .polar import polar_to_xyz, xyz_to_lonlat, polar_dataset_to_lonlat
-from .gridding import polar_to_grid_2d
+from .polar import polar_to_xyz, xyz_to_lonlat, xyz_to_lonlatalt_local, polar_dataset_to_lonlat
+from .gridding import polar_to_grid_2d, polar_to_grid_2d_many, build_gridder, apply_gridder
@@ -1,61 +1,475 @@
 # src/georef/gridding.py
 from __future__ import annotations
 
-from typing import Tuple
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 import xarray as xr
 from pyproj import CRS, Transformer
 from scipy.spatial import cKDTree
 
+from .polar import _geometry_hash, _geometry_key
+from ..utils import BoundedCache
+
+# cKDTree orientado a consultas (muchas más celdas que bins): con árbol no balanceado,
+# leafsize=32 fue el más rápido en construcción+consulta frente a 16 y 64
+# (360x240 y 360x1200 bins, grillas de 521^2 y 1000^2 celdas).
+_KDTREE_KW = {"leafsize": 32, "balanced_tree": False, "compact_nodes": False}
+
+# Gridders ya construidos en este proceso: clave -> (xs, ys, idx), LRU acotado
+# (sin marca georef_key la clave sale de lon/lat exactos y cada barrido es nuevo)
+_GRIDDER_CACHE_SIZE = 8
+# Máximo de archivos gridder_*.npz en cache_dir (se borran los de uso más antiguo)
+_GRIDDER_DISK_MAX = 32
+_GRIDDER_CACHE: "OrderedDict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]" = OrderedDict()
+_GRIDDER_LOCK = threading.Lock()
+
+
+def _polar_lattice_index(X: np.ndarray, Y: np.ndarray,
+                         X0: float, Y0: float,
+                         xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Búsqueda analítica sobre la malla polar regular (azimuth, range): para cada
+    celda (ys, xs) calcula distancia y rumbo respecto al radar (X0, Y0) y la asigna
+    al bin de rango y al rayo más cercanos (el bin polar que contiene la celda).
+
+    Devuelve: az_idx, rng_idx, inside (arrays (ny, nx)).
+    """
+    dXp = X - X0
+    dYp = Y - Y0
+
+    # Distancia proyectada de cada bin (promedio sobre azimutes) y rumbo de cada rayo
+    rho_bins = np.nanmean(np.hypot(dXp, dYp), axis=0)
+    theta_rays = np.degrees(np.arctan2(np.nansum(dXp, axis=1), np.nansum(dYp, axis=1))) % 360.0
+
+    dxc = xs[None, :] - X0
+    dyc = ys[:, None] - Y0
+    rho = np.hypot(dxc, dyc)
+    theta = np.degrees(np.arctan2(dxc, dyc)) % 360.0  # rumbo horario desde el norte
+
+    # Rango: bin más cercano (límites en puntos medios)
+    mid = 0.5 * (rho_bins[1:] + rho_bins[:-1])
+    rng_idx = np.searchsorted(mid, rho)
+    half0 = 0.5 * (rho_bins[1] - rho_bins[0]) if rho_bins.size > 1 else np.inf
+    half1 = 0.5 * (rho_bins[-1] - rho_bins[-2]) if rho_bins.size > 1 else np.inf
+    inside = (rho >= rho_bins[0] - half0) & (rho <= rho_bins[-1] + half1)
+
+    # Azimut: rayo más cercano con vuelta circular en 0/360
+    order = np.argsort(theta_rays)
+    t_sorted = theta_rays[order]
+    t_ext = np.concatenate([t_sorted[-1:] - 360.0, t_sorted, t_sorted[:1] + 360.0])
+    o_ext = np.concatenate([order[-1:], order, order[:1]])
+    pos = np.clip(np.searchsorted(t_ext, theta), 1, t_ext.size - 1)
+    d_left = theta - t_ext[pos - 1]
+    d_right = t_ext[pos] - theta
+    near = np.where(d_left <= d_right, pos - 1, pos)
+    az_idx = o_ext[near]
+
+    # Huecos angulares (barridos sectoriales/incompletos): entre dos rayos contiguos
+    # todo cuenta; frente a un hueco sólo hasta medio ancho de haz del rayo del borde
+    if t_sorted.size > 1:
+        daz = float(np.median(np.diff(t_sorted)))
+        gap = t_ext[pos] - t_ext[pos - 1]
+        inside &= (gap <= 1.5 * daz) | (np.minimum(d_left, d_right) <= 0.5 * daz * 1.02)
+
+    return az_idx, rng_idx, inside
+
+
+@lru_cache(maxsize=8)
+def _transformer(epsg: int) -> Transformer:
+    """
+    Transformer WGS84 -> EPSG destino (reutilizado entre llamadas).
+    """
+    return Transformer.from_crs("EPSG:4326", CRS.from_epsg(epsg), always_xy=True)
+
+
+def _project_lonlat(lon: np.ndarray, lat: np.ndarray, epsg: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Proyecta lon/lat a (X, Y) en el EPSG destino.
+    """
+    if CRS.from_epsg(epsg).equals(CRS.from_epsg(4326)):
+        # Identidad: no pasar por pyproj
+        return lon, lat
+    # Sin reconvertir: pyproj copia la entrada a float64 de todos modos
+    lon = np.asarray(lon)
+    lat = np.asarray(lat)
+    Xf, Yf = _transformer(epsg).transform(lon.ravel(), lat.ravel())
+    return np.asarray(Xf).reshape(lon.shape), np.asarray(Yf).reshape(lat.shape)
+
+
+# (X, Y) proyectados por (epsg, geometría) (clave tolerante, ver polar._geometry_key)
+_PROJECTED_CACHE = BoundedCache(8)
+
+
+def _compute_projected_grid(epsg: int, geometry: tuple,
+                            lon: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (X, Y) proyectados (sólo lectura) de una geometría polar; en caché, barridos
+    sucesivos con la misma malla nominal no vuelven a pasar por pyproj.
+    """
+    cached = _PROJECTED_CACHE.get((epsg, geometry))
+    if cached is not None:
+        return cached
+    X, Y = _project_lonlat(lon, lat, epsg)
+    X, Y = np.array(X), np.array(Y)
+    X.flags.writeable = False
+    Y.flags.writeable = False
+    return _PROJECTED_CACHE.put((epsg, geometry), (X, Y))
+
+
+def _dataset_geometry(ds_lonlat: xr.Dataset, varname: str) -> Optional[tuple]:
+    """
+    Clave de geometría polar del Dataset, o None si no conserva la malla
+    (azimuth, range), falta la posición del radar en attrs o sus lon/lat no son los
+    generados por polar_dataset_to_lonlat con esa geometría (attrs['georef_key'], que
+    incluye una huella de lon/lat: si se editan o reproyectan, no coincide).
+    """
+    if ds_lonlat[varname].dims != ("azimuth", "range"):
+        return None
+    attrs = ds_lonlat.attrs
+    pos = [float(attrs.get(k, np.nan)) for k in ("radar_lon", "radar_lat", "radar_alt_m")]
+    if not np.all(np.isfinite(pos)):
+        return None
+    geometry = _geometry_key(ds_lonlat["range"].values, ds_lonlat["azimuth"].values,
+                             float(attrs.get("elevation_deg", 0.0)), *pos,
+                             fast_georef=bool(attrs.get("fast_georef", True)))
+    if attrs.get("georef_key") != _geometry_hash(geometry, ds_lonlat["lon"].values,
+                                                 ds_lonlat["lat"].values):
+        return None
+    return geometry
+
+
+def _use_lattice(ds_lonlat: xr.Dataset, varname: str, crs: CRS, analytic: bool) -> bool:
+    """
+    Indica si aplica la búsqueda analítica sobre la malla polar.
+    """
+    radar_lon = float(ds_lonlat.attrs.get("radar_lon", np.nan))
+    radar_lat = float(ds_lonlat.attrs.get("radar_lat", np.nan))
+    return (analytic
+            and ds_lonlat[varname].dims == ("azimuth", "range")
+            and crs.is_projected
+            and np.isfinite(radar_lon) and np.isfinite(radar_lat))
+
+
+def _gridder_key(ds_lonlat: xr.Dataset, varname: str, geometry: Optional[tuple],
+                 epsg: int, dx: float, dy: float, buffer_m: float, analytic: bool,
+                 extent: Optional[Tuple[float, float, float, float]]) -> str:
+    """
+    Clave del gridder: los datos de los que salen X/Y (la geometría polar de
+    _dataset_geometry, con la malla nominal de azimutes, o, si no la hay, lon/lat
+    completos), la posición del radar usada por la búsqueda analítica y los
+    parámetros de grilla.
+    """
+    attrs = ds_lonlat.attrs
+    h = hashlib.sha1()
+    h.update(repr((
+        float(attrs.get("radar_lon", np.nan)),
+        float(attrs.get("radar_lat", np.nan)),
+        ds_lonlat[varname].dims, ds_lonlat[varname].shape,
+        int(epsg), float(dx), float(dy), float(buffer_m), bool(analytic),
+        None if extent is None else tuple(float(e) for e in extent),
+    )).encode())
+    if geometry is not None:
+        h.update(b"geometry")
+        for part in geometry:
+            h.update(part if isinstance(part, bytes) else repr(part).encode())
+    else:
+        h.update(b"lonlat")
+        for name in ("lon", "lat"):
+            arr = np.ascontiguousarray(ds_lonlat[name].values)
+            h.update(repr((arr.dtype.str, arr.shape)).encode())
+            h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def _clip_margin(X: np.ndarray, Y: np.ndarray, dx: float, dy: float) -> float:
+    """
+    Margen de recorte: máximo entre la celda (dx, dy) y la separación entre bins
+    vecinos a lo largo de cada eje de la malla polar.
+    """
+    margin = max(dx, dy)
+    for ax in range(X.ndim):
+        if X.shape[ax] > 1:
+            step = np.hypot(np.diff(X, axis=ax), np.diff(Y, axis=ax))
+            if np.isfinite(step).any():
+                margin = max(margin, float(np.nanmax(step)))
+    return margin
+
+
+def _cache_get(key: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    with _GRIDDER_LOCK:
+        gridder = _GRIDDER_CACHE.get(key)
+        if gridder is not None:
+            _GRIDDER_CACHE.move_to_end(key)
+        return gridder
+
+
+def _cache_put(key: str, gridder: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Arrays compartidos entre llamadas: sólo lectura
+    for arr in gridder:
+        arr.flags.writeable = False
+    with _GRIDDER_LOCK:
+        _GRIDDER_CACHE[key] = gridder
+        _GRIDDER_CACHE.move_to_end(key)
+        while len(_GRIDDER_CACHE) > _GRIDDER_CACHE_SIZE:
+            _GRIDDER_CACHE.popitem(last=False)
+    return gridder
+
+
+def _save_gridder(path: Path, xs: np.ndarray, ys: np.ndarray, idx: np.ndarray) -> None:
+    """
+    Guarda el gridder en .npz de forma atómica (temporal + os.replace), para que
+    ejecuciones en paralelo nunca lean un archivo a medio escribir.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.stem, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, xs=xs, ys=ys, idx=idx)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _load_gridder(path: Path) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Lee un gridder .npz; None si falta o está corrupto/truncado (se reconstruye y
+    se sobrescribe). Actualiza su mtime, que ordena la poda de _prune_cache_dir.
+    """
+    try:
+        with np.load(path) as f:
+            gridder = (f["xs"], f["ys"], f["idx"])
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # zip/npy inválido, claves faltantes, etc.
+        print(f"[WARN] Gridder en caché ilegible, se reconstruye: {path} ({e})")
+        return None
+    return gridder
+
+
+def _prune_cache_dir(cache_dir: Path, keep: int) -> None:
+    """
+    Deja en cache_dir sólo los `keep` gridders usados más recientemente (por mtime).
+    """
+    files = []
+    for p in cache_dir.glob("gridder_*.npz"):
+        try:
+            files.append((p.stat().st_mtime, p))
+        except FileNotFoundError:  # borrado por otra ejecución
+            continue
+    files.sort(reverse=True)
+    for _, p in files[keep:]:
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def build_gridder(ds_lonlat: xr.Dataset,
+                  epsg: int,
+                  dx: float,
+                  dy: float,
+                  buffer_m: float,
+                  analytic: bool = True,
+                  cache_dir: Optional[str | Path] = None,
+                  extent: Optional[Tuple[float, float, float, float]] = None
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Construye el mapeo polar -> grilla regular (vecino más cercano).
+    extent = (x0, x1, y0, y1) en el EPSG destino fija un subdominio; por defecto
+    la extensión de los datos más buffer_m.
+
+    Devuelve: xs, ys, idx con idx (ny, nx) índices planos sobre el campo polar;
+    el índice n = campo.size marca celdas sin dato. El resultado sólo depende de la
+    geometría, por lo que se reutiliza en memoria (LRU, arrays de sólo lectura) y, si
+    se indica cache_dir, en disco (archivo .npz nombrado por el hash de la clave; a lo
+    sumo _GRIDDER_DISK_MAX archivos, los de uso más antiguo se borran).
+    """
+    varname = next(iter(ds_lonlat.data_vars))  # asumimos un solo campo (dBZ)
+    geometry = _dataset_geometry(ds_lonlat, varname)
+    key = _gridder_key(ds_lonlat, varname, geometry, epsg, dx, dy, buffer_m, analytic, extent)
+    gridder = _cache_get(key)
+    if gridder is not None:
+        return gridder
+
+    cache_path = Path(cache_dir) / f"gridder_{key}.npz" if cache_dir is not None else None
+    if cache_path is not None:
+        gridder = _load_gridder(cache_path)
+        if gridder is not None:
+            return _cache_put(key, gridder)
+
+    shape = ds_lonlat[varname].shape
+    n = int(np.prod(shape))
+    crs = CRS.from_epsg(epsg)
+
+    # Proyección a X/Y: reutilizada si la geometría polar es conocida
+    if geometry is not None:
+        X, Y = _compute_projected_grid(int(epsg), geometry,
+                                       ds_lonlat["lon"].values, ds_lonlat["lat"].values)
+    else:
+        X, Y = _project_lonlat(ds_lonlat["lon"].values, ds_lonlat["lat"].values, epsg)
+
+    # Extensión (coordenadas de grilla en float64)
+    if extent is None:
+        x0 = float(np.nanmin(X)) - buffer_m
+        x1 = float(np.nanmax(X)) + buffer_m
+        y0 = float(np.nanmin(Y)) - buffer_m
+        y1 = float(np.nanmax(Y)) + buffer_m
+    else:
+        x0, x1, y0, y1 = (float(e) for e in extent)
+
+    xs = np.arange(x0, x1 + dx, dx)
+    ys = np.arange(y0, y1 + dy, dy)
+
+    if _use_lattice(ds_lonlat, varname, crs, analytic):
+        X0, Y0 = _transformer(int(epsg)).transform(float(ds_lonlat.attrs["radar_lon"]),
+                                                   float(ds_lonlat.attrs["radar_lat"]))
+        az_idx, rng_idx, inside = _polar_lattice_index(X, Y, X0, Y0, xs, ys)
+        rng_idx = np.minimum(rng_idx, shape[1] - 1)
+        idx = (az_idx * shape[1] + rng_idx).astype(np.int32)
+        idx[~inside] = n
+    else:
+        # KNN 1 vecino sobre los bins con coordenadas válidas, hasta una distancia m
+        # (>= separación máxima entre bins vecinos): más lejos la celda queda sin dato
+        mask = np.isfinite(X)
+        mask &= np.isfinite(Y)
+        m = _clip_margin(X, Y, dx, dy)
+        if extent is not None:
+            # Subdominio: descartar bins a más de m de la grilla antes de construir el
+            # árbol; con el mismo límite de distancia en la consulta el resultado es
+            # idéntico al del árbol completo.
+            mask &= (X >= x0 - m) & (X <= x1 + m) & (Y >= y0 - m) & (Y <= y1 + m)
+        pts = np.column_stack([X[mask].ravel(), Y[mask].ravel()])
+        if pts.size == 0:
+            # vacío: todas las celdas sin dato
+            idx = np.full((ys.size, xs.size), n, dtype=np.int32)
+        else:
+            tree = cKDTree(pts, **_KDTREE_KW)
+            # Consulta (ny*nx, 2) escrita por broadcasting, sin meshgrid ni copias intermedias
+            q = np.empty((ys.size * xs.size, 2), dtype=np.float64)
+            q3 = q.reshape(ys.size, xs.size, 2)
+            q3[..., 0] = xs[None, :]
+            q3[..., 1] = ys[:, None]
+            # búsqueda en paralelo (todos los núcleos); sin vecino a <= m: iq == len(pts)
+            _, iq = tree.query(q, k=1, workers=-1, distance_upper_bound=m)
+            bins = np.append(np.flatnonzero(mask.ravel()), n).astype(np.int32)
+            idx = bins[iq].reshape(ys.size, xs.size)
+
+    if cache_path is not None:
+        _save_gridder(cache_path, xs, ys, idx)
+        _prune_cache_dir(cache_path.parent, _GRIDDER_DISK_MAX)
+    return _cache_put(key, (xs, ys, idx))
+
+
+def apply_gridder(vals: np.ndarray, idx: np.ndarray, nodata: float,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Aplica el mapeo de build_gridder a un campo polar: out = vals[idx] (float32),
+    con NaN y celdas sin dato (índice vals.size) en nodata. El campo se pasa a
+    float32 antes del gather; `out` permite reutilizar un buffer (idx.shape, float32).
+    """
+    flat = np.asarray(vals).ravel()
+    ext = np.empty(flat.size + 1, dtype=np.float32)
+    ext[:-1] = flat
+    ext[-1] = nodata
+    # NaN/inf -> nodata en el campo polar, en sitio
+    np.copyto(ext, nodata, where=~np.isfinite(ext))
+    if out is None:
+        out = np.empty(idx.shape, dtype=np.float32)
+    return np.take(ext, idx, out=out)
+
 
 def polar_to_grid_2d(ds_lonlat: xr.Dataset,
                      epsg: int,
                      dx: float,
                      dy: float,
                      buffer_m: float,
-                     nodata: float = -9999.0) -> xr.Dataset:
+                     nodata: float = -9999.0,
+                     analytic: bool = True,
+                     cache_dir: Optional[str | Path] = None,
+                     extent: Optional[Tuple[float, float, float, float]] = None) -> xr.Dataset:
     """
     Proyecta lon/lat a (X,Y) en EPSG dado y rasteriza el campo en una grilla regular
     mediante vecino más cercano (KNN=1).
 
+    Si el Dataset conserva la malla polar (dims 'azimuth','range'), la posición del
+    radar está en attrs (radar_lon/radar_lat) y el EPSG es proyectado, cada celda toma
+    el bin polar que la contiene (rango/rumbo analíticos) sin construir el cKDTree.
+    Las celdas fuera del alcance del barrido y los bins sin dato quedan en nodata.
+    El mapeo se reutiliza entre llamadas con la misma geometría (ver build_gridder).
+    extent = (x0, x1, y0, y1) limita la grilla a un subdominio.
+
     Retorna Dataset con dims ('y','x') y variable principal con mismo nombre (ej. 'dBZ').
     """
-    varname = list(ds_lonlat.data_vars)[0]  # asumimos un solo campo (dBZ)
-    v = ds_lonlat[varname].values
-    lon = ds_lonlat["lon"].values
-    lat = ds_lonlat["lat"].values
+    varname = next(iter(ds_lonlat.data_vars))  # asumimos un solo campo (dBZ)
+    xs, ys, idx = build_gridder(ds_lonlat, epsg, dx, dy, buffer_m,
+                                analytic=analytic, cache_dir=cache_dir, extent=extent)
+    vals = np.ascontiguousarray(ds_lonlat[varname].values, dtype=np.float32)
+    out = apply_gridder(vals, idx, nodata)
 
-    # Proyección a X/Y
     crs = CRS.from_epsg(epsg)
-    t = Transformer.from_crs("EPSG:4326", crs, always_xy=True)
-    X, Y = t.transform(lon, lat)
+    method = ("nearest (polar lattice)" if _use_lattice(ds_lonlat, varname, crs, analytic)
+              else "nearest (K=1)")
+    return _grid_dataset(out, xs, ys, ds_lonlat, varname, epsg, nodata, method=method)
 
-    # Extensión
-    x0 = np.nanmin(X) - buffer_m
-    x1 = np.nanmax(X) + buffer_m
-    y0 = np.nanmin(Y) - buffer_m
-    y1 = np.nanmax(Y) + buffer_m
 
-    xs = np.arange(x0, x1 + dx, dx)
-    ys = np.arange(y0, y1 + dy, dy)
+def polar_to_grid_2d_many(datasets: Sequence[xr.Dataset],
+                          epsg: int,
+                          dx: float,
+                          dy: float,
+                          buffer_m: float,
+                          nodata: float = -9999.0,
+                          analytic: bool = True,
+                          cache_dir: Optional[str | Path] = None,
+                          extent: Optional[Tuple[float, float, float, float]] = None,
+                          max_workers: Optional[int] = None) -> List[xr.Dataset]:
+    """
+    polar_to_grid_2d sobre varios barridos. Los gridders se construyen en serie, una
+    vez por geometría (clave de build_gridder), y se guardan aquí mismo: con más
+    geometrías que el LRU ninguna se reconstruye. El gather de cada barrido corre en
+    un ThreadPoolExecutor (np.take y np.copyto liberan el GIL) y sólo usa esos
+    gridders, sin llamar a build_gridder.
+    """
+    crs = CRS.from_epsg(epsg)
+    gridders = {}
+    jobs = []
+    for ds in datasets:
+        varname = next(iter(ds.data_vars))  # asumimos un solo campo (dBZ)
+        key = _gridder_key(ds, varname, _dataset_geometry(ds, varname),
+                           epsg, dx, dy, buffer_m, analytic, extent)
+        if key not in gridders:
+            gridders[key] = build_gridder(ds, epsg, dx, dy, buffer_m, analytic=analytic,
+                                          cache_dir=cache_dir, extent=extent)
+        jobs.append((ds, varname, gridders[key]))
 
-    # KNN 1 vecino
-    mask = np.isfinite(v) & np.isfinite(X) & np.isfinite(Y)
-    pts = np.column_stack([X[mask].ravel(), Y[mask].ravel()])
-    vals = v[mask].ravel()
+    def _grid(job) -> xr.Dataset:
+        ds, varname, (xs, ys, idx) = job
+        vals = np.ascontiguousarray(ds[varname].values, dtype=np.float32)
+        out = apply_gridder(vals, idx, nodata)
+        method = ("nearest (polar lattice)" if _use_lattice(ds, varname, crs, analytic)
+                  else "nearest (K=1)")
+        return _grid_dataset(out, xs, ys, ds, varname, epsg, nodata, method=method)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(_grid, jobs))
 
-    if pts.size == 0:
-        # vacío: devolver grilla nodata
-        out = np.full((ys.size, xs.size), nodata, dtype=np.float32)
-    else:
-        tree = cKDTree(pts)
-        XX, YY = np.meshgrid(xs, ys)
-        q = np.column_stack([XX.ravel(), YY.ravel()])
-        _, idx = tree.query(q, k=1)
-        out = vals[idx].reshape(YY.shape).astype(np.float32)
-        out[~np.isfinite(out)] = nodata
 
+def _grid_dataset(out: np.ndarray, xs: np.ndarray, ys: np.ndarray,
+                  ds_lonlat: xr.Dataset, varname: str, epsg: int,
+                  nodata: float, method: str) -> xr.Dataset:
+    """
+    Empaqueta la grilla (ny, nx) como Dataset con coords x/y y metadatos.
+    """
     da = xr.DataArray(
         out,
         dims=("y", "x"),
@@ -67,7 +481,7 @@ def polar_to_grid_2d(ds_lonlat: xr.Dataset,
     ds_out = da.to_dataset()
     ds_out.attrs.update({
         "crs": f"EPSG:{epsg}",
-        "method": "nearest (K=1)",
+        "method": method,
         "nodata": float(nodata),
     })
     return ds_out
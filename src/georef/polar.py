@@ -1,15 +1,32 @@
 from __future__ import annotations
+import hashlib
 import numpy as np
 import xarray as xr
 import wradlib.georef as georef
 
+from ..utils import BoundedCache
+
+# WGS84 y alcance máximo para la georreferenciación local rápida
+_WGS84_A = 6378137.0
+_WGS84_E2 = 6.69437999014e-3
+_FAST_GEOREF_MAX_RANGE_M = 300_000.0
+_FAST_GEOREF_MAX_ABS_LAT = 5.0  # error < 15 m a 300 km; crece hasta ~70 m a 45°
+
+# Malla nominal de azimutes: cada rayo a <= 0.25·Δaz de a0 + i·Δaz
+_NOMINAL_AZ_TOL = 0.25
+
+# lon/lat/alt por geometría (clave tolerante, ver _azimuth_key)
+_LONLAT_CACHE = BoundedCache(8)
+
 def polar_to_xyz(ranges_m: np.ndarray,
                  azimuth_deg: np.ndarray,
                  elev_deg: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
     Convierte malla polar (range, azimuth, elev) a XYZ cartesianas (m) relativas al radar.
     """
-    rr, aa = np.meshgrid(ranges_m, np.deg2rad(azimuth_deg))
+    # Vistas (n_az, n_rng) por broadcasting: sin copiar las mallas como meshgrid
+    rr, aa = np.broadcast_arrays(np.asarray(ranges_m)[None, :],
+                                 np.deg2rad(np.asarray(azimuth_deg, dtype=np.float32))[:, None])
     el = np.deg2rad(elev_deg)
     xyz = georef.spherical_to_xyz(rr, aa, el)  # (3, n_az, n_rng)
     return xyz[0], xyz[1], xyz[2]
@@ -24,23 +41,154 @@ def xyz_to_lonlat(x: np.ndarray, y: np.ndarray, z: np.ndarray,
     return lon, lat, alt
 
 
+def xyz_to_lonlatalt_local(x: np.ndarray, y: np.ndarray, z: np.ndarray,
+                           lon0: float, lat0: float, alt0: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Versión rápida de xyz_to_lonlat para dominios pequeños: inversa cerrada de la
+    proyección azimutal equidistante sobre una esfera local con los radios de curvatura
+    WGS84 en la latitud del radar (norte reescalado por N/M). Sin iteraciones;
+    error < 15 m a 300 km para |lat0| <= 5°.
+    """
+    phi0 = np.deg2rad(lat0)
+    w = 1.0 - _WGS84_E2 * np.sin(phi0) ** 2
+    m = _WGS84_A * (1.0 - _WGS84_E2) / w ** 1.5  # radio meridiano
+    n = _WGS84_A / np.sqrt(w)                    # radio del primer vertical
+
+    ys = y * (n / m)
+    rho = np.hypot(x, ys) / n
+    theta = np.arctan2(x, ys)
+    sin_rho = np.sin(rho)
+    cos_rho = np.cos(rho)
+    sin_lat = np.sin(phi0) * cos_rho + np.cos(phi0) * sin_rho * np.cos(theta)
+
+    lat = np.rad2deg(np.arcsin(np.clip(sin_lat, -1.0, 1.0)))
+    lon = lon0 + np.rad2deg(np.arctan2(np.sin(theta) * sin_rho * np.cos(phi0),
+                                       cos_rho - np.sin(phi0) * sin_lat))
+    alt = alt0 + z
+    return lon, lat, alt
+
+
+def _azimuth_key(azimuth_deg: np.ndarray) -> tuple:
+    """
+    Clave tolerante de los azimutes. Si los rayos siguen una malla regular
+    a0 + i·Δaz (cada uno a <= 0.25·Δaz), la clave es la malla nominal: n, Δaz
+    (360/n en barridos completos, si no redondeado a 0.001°) y a0 cuantizado a Δaz/4.
+    Así el jitter de los ángulos por rayo entre barridos no cambia la clave.
+    Con rayos irregulares (huecos, saltos) la clave son los azimutes exactos.
+    """
+    az = np.asarray(azimuth_deg, dtype=np.float64)
+    n = az.size
+    exact = ("exact", np.ascontiguousarray(azimuth_deg, dtype=np.float32).tobytes())
+    if n < 2:
+        return exact
+
+    u = np.rad2deg(np.unwrap(np.deg2rad(az)))  # continuo a través de 0/360
+    i = np.arange(n)
+    daz = float(np.polyfit(i, u, 1)[0])
+    if daz == 0.0:
+        return exact
+    full = abs(abs(daz) * n - 360.0) <= _NOMINAL_AZ_TOL * abs(daz)
+    if full:
+        daz = float(np.copysign(360.0 / n, daz))
+    a0 = float(np.mean(u - i * daz))
+    if np.max(np.abs(u - (a0 + i * daz))) > _NOMINAL_AZ_TOL * abs(daz):
+        return exact
+
+    step = abs(daz) / 4.0
+    a0_q = int(np.round((a0 % 360.0) / step))
+    if full:
+        a0_q %= 4 * n
+    return ("nominal", n, round(daz, 3), a0_q)
+
+
+def _geometry_key(ranges_m: np.ndarray, azimuth_deg: np.ndarray, elev_deg: float,
+                  radar_lon: float, radar_lat: float, radar_alt_m: float,
+                  fast_georef: bool = True) -> tuple:
+    """
+    Clave hashable de la geometría polar (rangos, malla de azimutes, elevación,
+    posición del radar) y del método de georreferenciación efectivo (local sólo
+    hasta 300 km y |lat| <= 5°).
+
+    Aproximación: barridos con la misma malla nominal (ver _azimuth_key) comparten
+    clave y reutilizan lon/lat y gridder del primero. Sus rayos difieren en el jitter
+    entre barridos; en el peor caso < 0.75·Δaz (0.25·Δaz por rayo + Δaz/4 de a0).
+    """
+    ranges = np.ascontiguousarray(ranges_m, dtype=np.float32)
+    fast = (bool(fast_georef) and ranges.size > 0
+            and float(np.max(ranges)) <= _FAST_GEOREF_MAX_RANGE_M
+            and abs(float(radar_lat)) <= _FAST_GEOREF_MAX_ABS_LAT)
+    return (ranges.tobytes(), _azimuth_key(azimuth_deg),
+            float(elev_deg), float(radar_lon), float(radar_lat), float(radar_alt_m), fast)
+
+
+def _lonlat_checksum(lon: np.ndarray, lat: np.ndarray) -> bytes:
+    """
+    Huella barata de lon/lat: esquinas y centro de la malla (azimuth, range).
+    """
+    na, nr = lon.shape
+    rows = np.array([0, 0, na - 1, na - 1, na // 2])
+    cols = np.array([0, nr - 1, 0, nr - 1, nr // 2])
+    return (np.asarray(lon[rows, cols], dtype=np.float32).tobytes()
+            + np.asarray(lat[rows, cols], dtype=np.float32).tobytes())
+
+
+def _geometry_hash(geometry: tuple, lon: np.ndarray, lat: np.ndarray) -> str:
+    """
+    Huella (sha1) de una clave de geometría y de los lon/lat generados con ella; se
+    guarda en attrs['georef_key'] para reconocer lon/lat de polar_dataset_to_lonlat.
+    """
+    h = hashlib.sha1()
+    h.update(repr(geometry).encode())
+    h.update(_lonlat_checksum(lon, lat))
+    return h.hexdigest()
+
+
+def _lonlat_grid(geometry: tuple, ranges_m: np.ndarray,
+                 azimuth_deg: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    lon/lat/alt (float32, sólo lectura) de una geometría polar; cacheado por la clave
+    tolerante, de modo que barridos sucesivos con la misma malla reutilizan el primero.
+    """
+    cached = _LONLAT_CACHE.get(geometry)
+    if cached is not None:
+        return cached
+
+    elev, radar_lon, radar_lat, radar_alt_m, fast = geometry[2:]
+    x, y, z = polar_to_xyz(ranges_m, azimuth_deg, elev)
+    to_lonlat = xyz_to_lonlatalt_local if fast else xyz_to_lonlat
+    lon, lat, alt = to_lonlat(x, y, z, radar_lon, radar_lat, radar_alt_m)
+
+    out = tuple(np.asarray(arr, dtype=np.float32) for arr in (lon, lat, alt))
+    for arr in out:
+        arr.flags.writeable = False
+    return _LONLAT_CACHE.put(geometry, out)
+
+
 def polar_dataset_to_lonlat(ds: xr.Dataset,
                             radar_lon: float,
                             radar_lat: float,
                             radar_alt_m: float) -> xr.Dataset:
     """
     Anexa coordenadas lon/lat/alt al Dataset polar (dims: azimuth, range).
-    Requiere ds.attrs['elevation_deg'].
+    Requiere ds.attrs['elevation_deg']. Si ds.attrs['fast_georef'] (por defecto activo),
+    el alcance es <= 300 km y |radar_lat| <= 5° usa xyz_to_lonlatalt_local en lugar
+    de la conversión elipsoidal completa. Registra en attrs la posición del radar,
+    el método usado y la huella de la geometría y de lon/lat (georef_key): lon/lat no
+    deben modificarse después; si cambian, el gridding los proyecta de nuevo.
     """
     elev = float(ds.attrs.get("elevation_deg", 0.0))
-    ranges = ds["range"].values
-    az = ds["azimuth"].values
-
-    x, y, z = polar_to_xyz(ranges, az, elev)
-    lon, lat, alt = xyz_to_lonlat(x, y, z, radar_lon, radar_lat, radar_alt_m)
+    geometry = _geometry_key(ds["range"].values, ds["azimuth"].values, elev,
+                             radar_lon, radar_lat, radar_alt_m,
+                             fast_georef=bool(ds.attrs.get("fast_georef", True)))
+    lon, lat, alt = _lonlat_grid(geometry, ds["range"].values, ds["azimuth"].values)
 
-    # Añadir coords auxiliares
+    # Añadir coords auxiliares (float32: ~1 m en lon/lat)
     for name, arr in (("lon", lon), ("lat", lat), ("alt", alt)):
         ds = ds.assign_coords({name: (("azimuth", "range"), arr)})
+    ds = ds.assign_attrs(radar_lon=float(radar_lon),
+                         radar_lat=float(radar_lat),
+                         radar_alt_m=float(radar_alt_m),
+                         fast_georef=int(geometry[-1]),
+                         georef_key=_geometry_hash(geometry, lon, lat))
 
     return ds
@@ -51,7 +51,8 @@ def _get_data_and_axes(slc: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.
     if "data" not in slc:
         raise ValueError("Slice Rainbow sin 'data' decodificado.")
 
-    data = np.asarray(slc["data"])
+    # float32: la precisión del dBZ (~0.5 dB) no requiere float64
+    data = np.asarray(slc["data"], dtype=np.float32)
 
     # Elevación (grados)
     elev_deg = float(slc.get("@elevation", 0.0))
@@ -66,16 +67,16 @@ def _get_data_and_axes(slc: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.
         n_rng = int(slc["rays"]["ray"][0].get("@bins", data.shape[-1]))
     else:
         n_rng = data.shape[-1]
-    ranges_m = r0 + dr * np.arange(n_rng, dtype=float)
+    ranges_m = (r0 + dr * np.arange(n_rng, dtype=float)).astype(np.float32)
 
     # Azimutes:
     if "angles" in slc and "a" in slc["angles"]:
         az_list = slc["angles"]["a"]
-        az_deg = np.array([float(a) for a in az_list], dtype=float)
+        az_deg = np.fromiter(map(float, az_list), dtype=np.float32, count=len(az_list))
     else:
         # si no vienen listados, asumimos cubrimiento uniforme [0,360)
         n_az = data.shape[0]
-        az_deg = np.linspace(0.0, 360.0, n_az, endpoint=False, dtype=float)
+        az_deg = np.linspace(0.0, 360.0, n_az, endpoint=False, dtype=np.float32)
 
     meta = {
         "elevation_deg": elev_deg,
@@ -0,0 +1,237 @@
+import numpy as np
+import pytest
+import xarray as xr
+from pyproj import Geod, Transformer
+
+from src.georef.gridding import build_gridder, polar_to_grid_2d, polar_to_grid_2d_many
+
+RADAR_LON, RADAR_LAT = -81.0, -2.9  # meridiano central UTM 17S: convergencia ~0
+EPSG = 32717
+R0, DR, N_RNG = 500.0, 1000.0, 120
+
+
+def _sweep(az_deg: np.ndarray, seed: int = 0) -> xr.Dataset:
+    """Barrido sintético (azimuth, range) con lon/lat geodésicos."""
+    rng = R0 + DR * np.arange(N_RNG)
+    AZ, RR = np.meshgrid(az_deg, rng, indexing="ij")
+    lon, lat, _ = Geod(ellps="WGS84").fwd(np.full(AZ.shape, RADAR_LON),
+                                          np.full(AZ.shape, RADAR_LAT), AZ, RR)
+    v = np.random.default_rng(seed).normal(20.0, 10.0, AZ.shape).astype(np.float32)
+    return xr.Dataset(
+        {"dBZ": (("azimuth", "range"), v, {"units": "dBZ"})},
+        coords={"azimuth": az_deg.astype(np.float32), "range": rng.astype(np.float32),
+                "lon": (("azimuth", "range"), lon), "lat": (("azimuth", "range"), lat)},
+        attrs={"elevation_deg": 0.0, "radar_lon": RADAR_LON, "radar_lat": RADAR_LAT},
+    )
+
+
+def _cell_polar(xs: np.ndarray, ys: np.ndarray):
+    X0, Y0 = Transformer.from_crs("EPSG:4326", f"EPSG:{EPSG}", always_xy=True).transform(
+        RADAR_LON, RADAR_LAT)
+    dxc = xs[None, :] - X0
+    dyc = ys[:, None] - Y0
+    return np.hypot(dxc, dyc), np.degrees(np.arctan2(dxc, dyc)) % 360.0
+
+
+def _grid(ds: xr.Dataset, analytic: bool):
+    return build_gridder(ds, EPSG, 1000.0, 1000.0, 5000.0, analytic=analytic)
+
+
+def test_lattice_matches_kdtree_within_one_bin():
+    az = (np.arange(360) + 0.5 + np.random.default_rng(1).uniform(-0.2, 0.2, 360)) % 360.0
+    ds = _sweep(az)
+    n = ds["dBZ"].size
+    xs, ys, idx_lat = _grid(ds, analytic=True)
+    xs_kd, ys_kd, idx_kd = _grid(ds, analytic=False)
+    np.testing.assert_array_equal(xs, xs_kd)
+    np.testing.assert_array_equal(ys, ys_kd)
+
+    valid = idx_lat != n
+    assert idx_kd[valid].min() >= 0 and idx_kd[valid].max() < n
+
+    # Sin huecos: toda celda dentro del alcance tiene dato
+    rho, _ = _cell_polar(xs, ys)
+    assert valid[(rho > R0) & (rho < R0 + DR * (N_RNG - 1))].all()
+    assert not valid[rho > R0 + DR * N_RNG].any()
+
+    # Bin polar vs vecino euclidiano: a lo sumo un rayo / un bin de distancia
+    a_lat, r_lat = np.divmod(idx_lat[valid], N_RNG)
+    a_kd, r_kd = np.divmod(idx_kd[valid], N_RNG)
+    d_az = np.abs(a_lat - a_kd)
+    assert np.minimum(d_az, 360 - d_az).max() <= 1
+    assert np.abs(r_lat - r_kd).max() <= 1
+    assert (idx_lat[valid] == idx_kd[valid]).mean() > 0.8
+
+
+def test_lattice_wraps_at_north():
+    az = np.arange(360) + 0.5
+    ds = _sweep(az)
+    xs, ys, idx = _grid(ds, analytic=True)
+    rho, theta = _cell_polar(xs, ys)
+    ring = (rho > 20_000.0) & (rho < 100_000.0)
+
+    north = ring & ((theta < 0.5) | (theta > 359.5))
+    assert north.any()
+    a_idx = idx[north] // N_RNG
+    assert np.isin(a_idx, (0, 359)).all()
+    assert set(a_idx[theta[north] < 0.5]) == {0}
+    assert set(a_idx[theta[north] > 359.5]) == {359}
+
+
+def test_lattice_sector_scan_edges():
+    az = np.arange(90, 180) + 0.5
+    ds = _sweep(az)
+    n = ds["dBZ"].size
+    xs, ys, idx = _grid(ds, analytic=True)
+    rho, theta = _cell_polar(xs, ys)
+    ring = (rho > 20_000.0) & (rho < 100_000.0)
+    valid = idx != n
+
+    # Medio ancho de haz más allá de los rayos del borde, no más
+    assert not valid[ring & ((theta < 89.9) | (theta > 180.1))].any()
+    assert valid[ring & (theta > 90.1) & (theta < 179.9)].all()
+
+
+@pytest.mark.parametrize("analytic", [True, False])
+def test_polar_to_grid_2d_nodata(analytic):
+    ds = _sweep(np.arange(360) + 0.5)
+    ds["dBZ"][:, :10] = np.nan
+    out = polar_to_grid_2d(ds, EPSG, 1000.0, 1000.0, 5000.0, nodata=-9999.0, analytic=analytic)
+    vals = out["dBZ"].values
+    assert vals.dtype == np.float32
+    assert np.isfinite(vals).all()
+    assert (vals == -9999.0).any()
+
+
+def test_gridder_cache_follows_lonlat():
+    ds = _sweep(np.arange(360) + 0.5)
+    ds.attrs["radar_alt_m"] = float("nan")  # como read_azi sin @alt
+    xs, _, _ = _grid(ds, analytic=False)
+    shifted = ds.assign_coords(lon=ds["lon"] + 0.5)
+    xs_shifted, _, _ = _grid(shifted, analytic=False)
+    assert xs_shifted[0] > xs[0] + 50_000.0
+
+
+def test_gridder_cache_bounded_and_read_only(tmp_path):
+    from src.georef import gridding
+
+    jitter = np.random.default_rng(2)
+    for _ in range(gridding._GRIDDER_CACHE_SIZE + 3):
+        ds = _sweep(np.arange(360) + 0.5 + jitter.uniform(-0.1, 0.1, 360))
+        xs, ys, idx = build_gridder(ds, EPSG, 1000.0, 1000.0, 5000.0, cache_dir=tmp_path)
+    assert len(gridding._GRIDDER_CACHE) == gridding._GRIDDER_CACHE_SIZE
+    assert not idx.flags.writeable and not xs.flags.writeable
+
+    gridding._GRIDDER_CACHE.clear()
+    xs2, ys2, idx2 = build_gridder(ds, EPSG, 1000.0, 1000.0, 5000.0, cache_dir=tmp_path)
+    np.testing.assert_array_equal(idx2, idx)
+    assert not idx2.flags.writeable
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_projection_uses_dataset_lonlat_without_marker(monkeypatch):
+    from src.georef import gridding
+    from src.georef.polar import _geometry_hash
+
+    calls = []
+    real = gridding._project_lonlat
+
+    def _fake_projected_grid(epsg, geometry, lon, lat):
+        calls.append(geometry)
+        return real(lon, lat, epsg)
+
+    monkeypatch.setattr(gridding, "_compute_projected_grid", _fake_projected_grid)
+
+    ds = _sweep(np.arange(360) + 0.5)
+    ds.attrs["radar_alt_m"] = 4450.0
+    assert gridding._dataset_geometry(ds, "dBZ") is None
+    _grid(ds, analytic=True)
+    assert not calls
+
+    geometry = gridding._geometry_key(ds["range"].values, ds["azimuth"].values, 0.0,
+                                      RADAR_LON, RADAR_LAT, 4450.0)
+    ds.attrs.update(fast_georef=int(geometry[-1]),
+                    georef_key=_geometry_hash(geometry, ds["lon"].values, ds["lat"].values))
+    assert gridding._dataset_geometry(ds, "dBZ") == geometry
+    _grid(ds, analytic=True)
+    assert calls == [geometry]
+
+
+def _mark(ds: xr.Dataset, alt: float = 4450.0) -> xr.Dataset:
+    """Marca georef_key como polar_dataset_to_lonlat (sin pasar por wradlib)."""
+    from src.georef.polar import _geometry_hash, _geometry_key
+
+    geometry = _geometry_key(ds["range"].values, ds["azimuth"].values, 0.0,
+                             RADAR_LON, RADAR_LAT, alt)
+    return ds.assign_attrs(radar_alt_m=alt, fast_georef=int(geometry[-1]),
+                           georef_key=_geometry_hash(geometry, ds["lon"].values,
+                                                     ds["lat"].values))
+
+
+def test_gridder_disk_cache_tolerant_bounded_and_repaired(tmp_path, monkeypatch):
+    from src.georef import gridding
+
+    gridding._GRIDDER_CACHE.clear()
+    jitter = np.random.default_rng(3)
+    for _ in range(4):
+        ds = _mark(_sweep(np.arange(360) + 0.5 + jitter.uniform(-0.1, 0.1, 360)))
+        _, _, idx = build_gridder(ds, EPSG, 1000.0, 1000.0, 5000.0, cache_dir=tmp_path)
+    (path,) = tmp_path.glob("gridder_*.npz")
+
+    # Archivo truncado: se reconstruye y se sobrescribe
+    path.write_bytes(path.read_bytes()[:100])
+    gridding._GRIDDER_CACHE.clear()
+    _, _, idx2 = build_gridder(ds, EPSG, 1000.0, 1000.0, 5000.0, cache_dir=tmp_path)
+    np.testing.assert_array_equal(idx2, idx)
+    with np.load(path) as f:
+        np.testing.assert_array_equal(f["idx"], idx)
+
+    # Geometrías distintas: el directorio no pasa de _GRIDDER_DISK_MAX archivos
+    monkeypatch.setattr(gridding, "_GRIDDER_DISK_MAX", 3)
+    for alt in range(5):
+        build_gridder(_mark(ds, float(alt)), EPSG, 1000.0, 1000.0, 5000.0, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("gridder_*.npz"))) == 3
+
+
+def test_kdtree_extent_matches_full_domain():
+    ds = _sweep(np.arange(360) + 0.5)
+    xs, ys, idx = _grid(ds, analytic=False)
+    n = ds["dBZ"].size
+    assert (idx == n).any()  # esquinas fuera del alcance: sin dato
+
+    # Subdominio que cruza el borde de cobertura, alineado con la grilla completa
+    i0, i1, j0, j1 = 5, 65, 10, 80
+    extent = (xs[j0], xs[j1 - 1], ys[i0], ys[i1 - 1])
+    xs_e, ys_e, idx_e = build_gridder(ds, EPSG, 1000.0, 1000.0, 5000.0,
+                                      analytic=False, extent=extent)
+    np.testing.assert_allclose(xs_e, xs[j0:j1])
+    np.testing.assert_allclose(ys_e, ys[i0:i1])
+    sub = idx[i0:i1, j0:j1]
+    assert (sub == n).any() and (sub != n).any()
+    np.testing.assert_array_equal(idx_e, sub)
+
+
+def test_polar_to_grid_2d_many_builds_once_per_geometry(monkeypatch):
+    from src.georef import gridding
+
+    # Más barridos que el LRU, sin marca: cada uno es una geometría distinta
+    jitter = np.random.default_rng(4)
+    base = [_sweep(np.arange(360) + 0.5 + jitter.uniform(-0.1, 0.1, 360), seed=i)
+            for i in range(gridding._GRIDDER_CACHE_SIZE + 4)]
+    sweeps = base + [ds.copy() for ds in base]
+
+    builds = []
+    real = gridding._polar_lattice_index
+
+    def _counting(*args):
+        builds.append(1)
+        return real(*args)
+
+    monkeypatch.setattr(gridding, "_polar_lattice_index", _counting)
+    gridding._GRIDDER_CACHE.clear()
+    many = polar_to_grid_2d_many(sweeps, EPSG, 1000.0, 1000.0, 5000.0, max_workers=4)
+    assert len(builds) == len(base)
+
+    for ds, out in zip(sweeps, many):
+        ref = polar_to_grid_2d(ds, EPSG, 1000.0, 1000.0, 5000.0)
+        xr.testing.assert_identical(out, ref)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from scripts.parse_azi import build_parser, save_netcdf
+
+
+def _grid_ds() -> xr.Dataset:
+    v = np.random.default_rng(0).normal(20.0, 10.0, (40, 30)).astype(np.float32)
+    v[0, :5] = -9999.0
+    return xr.Dataset({"dBZ": (("y", "x"), v, {"units": "dBZ"})},
+                      coords={"x": np.arange(30) * 1000.0, "y": np.arange(40) * 1000.0},
+                      attrs={"crs": "EPSG:32717"})
+
+
+@pytest.mark.parametrize("complevel", [0, 4])
+@pytest.mark.parametrize("parallel", [False, True])
+@pytest.mark.parametrize("engine", ["h5netcdf", "netcdf4"])
+def test_save_netcdf_encoding_roundtrip(tmp_path, engine, parallel, complevel):
+    pytest.importorskip(engine if engine == "h5netcdf" else "netCDF4")
+    if parallel:
+        pytest.importorskip("dask")
+    ds = _grid_ds()
+    out = tmp_path / "grid.nc"
+    save_netcdf(ds, out, nodata=-9999.0, complevel=complevel, chunk=16,
+                engine=engine, parallel=parallel)
+
+    with xr.open_dataset(out, engine="netcdf4", mask_and_scale=False) as back:
+        enc = back["dBZ"].encoding
+        assert tuple(enc["chunksizes"]) == (16, 16)
+        assert bool(enc.get("zlib", False)) is (complevel > 0)
+        if complevel > 0:
+            assert enc["complevel"] == complevel and enc["shuffle"]
+        np.testing.assert_array_equal(back["dBZ"].values, ds["dBZ"].values)
+        assert back["dBZ"].attrs["_FillValue"] == np.float32(-9999.0)
+        assert back.attrs["Conventions"] == "CF-1.8"
+        assert back.attrs["crs"] == "EPSG:32717"
+
+
+def test_cli_nc_flags():
+    args = build_parser().parse_args(["--file", "a.azi", "--nc-grid", "--nc-complevel", "0",
+                                      "--nc-chunk", "256", "--nc-engine", "netcdf4",
+                                      "--nc-parallel"])
+    assert (args.nc_complevel, args.nc_chunk, args.nc_engine, args.nc_parallel) == (
+        0, 256, "netcdf4", True)
+
+    args = build_parser().parse_args(["--file", "a.azi"])
+    assert (args.nc_complevel, args.nc_chunk, args.nc_engine, args.nc_parallel) == (
+        4, 512, "h5netcdf", False)
+
+
+@pytest.mark.parametrize("flags", [["--nc-chunk", "0"], ["--nc-chunk", "-3"],
+                                   ["--nc-complevel", "10"], ["--nc-engine", "zarr"]])
+def test_cli_rejects_invalid_nc_flags(flags):
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["--file", "a.azi", *flags])
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import xarray as xr
+from pyproj import Geod, Transformer
+
+from src.georef import gridding, polar
+from src.georef.polar import _geometry_key, xyz_to_lonlatalt_local
+
+
+def _max_error_m(lat0: float, rng_m: float) -> float:
+    """Error máximo de la versión local frente a la inversa aeqd elipsoidal."""
+    a = np.deg2rad(np.arange(0.0, 360.0, 5.0))
+    x = rng_m * np.sin(a)
+    y = rng_m * np.cos(a)
+    t = Transformer.from_crs(f"+proj=aeqd +lat_0={lat0} +lon_0=-79 +ellps=WGS84",
+                             "EPSG:4326", always_xy=True)
+    lon_ref, lat_ref = t.transform(x, y)
+    lon, lat, _ = xyz_to_lonlatalt_local(x, y, np.zeros_like(x), -79.0, lat0, 0.0)
+    _, _, d = Geod(ellps="WGS84").inv(lon_ref, lat_ref, lon, lat)
+    return float(np.max(d))
+
+
+@pytest.mark.parametrize("lat0", [0.0, -2.9, 5.0, -5.0])
+def test_local_georef_error_bound(lat0):
+    assert _max_error_m(lat0, 300_000.0) < 15.0
+    assert _max_error_m(lat0, 100_000.0) < 2.0
+
+
+def test_local_georef_altitude():
+    _, _, alt = xyz_to_lonlatalt_local(np.zeros(2), np.zeros(2), np.array([0.0, 100.0]),
+                                       -79.0, -2.9, 4450.0)
+    np.testing.assert_allclose(alt, [4450.0, 4550.0])
+
+
+@pytest.mark.parametrize("lat0, max_rng, expected", [
+    (-2.9, 240_000.0, True),
+    (-2.9, 400_000.0, False),
+    (45.0, 240_000.0, False),
+])
+def test_fast_georef_gating(lat0, max_rng, expected):
+    ranges = np.linspace(500.0, max_rng, 10)
+    key = _geometry_key(ranges, np.arange(360) + 0.5, 0.5, -79.0, lat0, 4450.0, fast_georef=True)
+    assert key[-1] is expected
+    key = _geometry_key(ranges, np.arange(360) + 0.5, 0.5, -79.0, lat0, 4450.0, fast_georef=False)
+    assert key[-1] is False
+
+
+def _polar_ds(az_deg: np.ndarray) -> xr.Dataset:
+    rng = (500.0 + 1000.0 * np.arange(50)).astype(np.float32)
+    v = np.zeros((az_deg.size, rng.size), dtype=np.float32)
+    return xr.Dataset({"dBZ": (("azimuth", "range"), v)},
+                      coords={"azimuth": az_deg.astype(np.float32), "range": rng},
+                      attrs={"elevation_deg": 0.5})
+
+
+@pytest.fixture
+def flat_xyz(monkeypatch):
+    """polar_to_xyz plano (sin wradlib) que cuenta sus llamadas."""
+    calls = []
+
+    def _stub(ranges_m, azimuth_deg, elev_deg):
+        calls.append(elev_deg)
+        a = np.deg2rad(np.asarray(azimuth_deg, dtype=np.float64))[:, None]
+        r = np.asarray(ranges_m, dtype=np.float64)[None, :]
+        return r * np.sin(a), r * np.cos(a), np.zeros_like(r * a)
+
+    monkeypatch.setattr(polar, "polar_to_xyz", _stub)
+    polar._LONLAT_CACHE.clear()
+    yield calls
+    polar._LONLAT_CACHE.clear()
+
+
+def test_polar_dataset_to_lonlat_reuses_nominal_lattice(flat_xyz):
+    jitter = np.random.default_rng(0)
+    for _ in range(5):
+        az = (np.arange(360) + 0.5 + jitter.uniform(-0.2, 0.2, 360)) % 360.0
+        ds = polar.polar_dataset_to_lonlat(_polar_ds(np.roll(az, 7)), -79.0, -2.9, 4450.0)
+        assert gridding._dataset_geometry(ds, "dBZ") is not None
+    assert len(flat_xyz) == 1
+    assert ds["lon"].dtype == np.float32 and not ds["lon"].values.flags.writeable
+
+    # Rayos irregulares (hueco de 10°): clave exacta, nueva conversión
+    gap = np.delete(np.arange(360) + 0.5, np.s_[100:110])
+    polar.polar_dataset_to_lonlat(_polar_ds(gap), -79.0, -2.9, 4450.0)
+    assert len(flat_xyz) == 2
+
+
+def test_georef_key_rejects_edited_lonlat(flat_xyz):
+    ds = polar.polar_dataset_to_lonlat(_polar_ds(np.arange(360) + 0.5), -79.0, -2.9, 4450.0)
+    assert gridding._dataset_geometry(ds, "dBZ") is not None
+    moved = ds.assign_coords(lon=ds["lon"] + 0.01)
+    assert "georef_key" in moved.attrs
+    assert gridding._dataset_geometry(moved, "dBZ") is None